@@ -1,3 +1,7 @@
+import os
+import select
+import sys
+import time
 from enum import Enum
 
 import serial
@@ -67,25 +71,70 @@ class BadParameter(Exception):
 
     def __str__(self):
         if self.value is None:
-            return self.mesage
+            return self.message
         else:
             return f"[{self.value}] {self.message}"
 
 
-def _fmt(val, length, precision=0, sign=False):
-    if sign:
-        s = "-" if val < 0 else "+"
-        val = abs(val)
-    else:
-        s = ""
+class CommunicationTimeout(Exception):
+    pass
 
-    val *= 10**precision
 
-    return f"{s}{int(val):0{length}}"
+_PREFIX = b":01"
+_TERMINATOR = b"#"
+_CMD_CACHE = {}
+
+
+def _frame(instruction, data=""):
+    # Fixed payloads are passed as str and their frames are cached, while
+    # computed payloads (positions, durations) are passed as lists.
+    cacheable = isinstance(data, str)
+    message = _CMD_CACHE.get((instruction, data)) if cacheable else None
+    if message is None:
+        if not cacheable:
+            data = "".join(data)
+        # Instructions are literals from this module and payload widths are
+        # fixed by the callers, so these only guard against programming errors.
+        assert len(instruction) == 3, "Instruction must be a 3 character sequence."
+        assert len(data) <= 33, "Data must be at most 33 chars."
+        message = (
+            _PREFIX + instruction.encode("ascii") + data.encode("ascii") + _TERMINATOR
+        )
+        if cacheable:
+            _CMD_CACHE[(instruction, data)] = message
+    return message
+
+
+# Frames for the enum-driven commands are built once, at import time.
+for _member in DIRECTION:
+    _member._move_frame = _frame(f"mv{_member.value}")
+for _member in SHOOTING_CONTROL:
+    _member._control_frame = _frame("SPC", _member.value)
+for _member in TIMING_PARAMETER:
+    _member._get_frame = _frame("GTT", _member.value)
+del _member
+
+# Single-character responses, keyed by their encoded value. A last panorama
+# mode of "0" means that no panorama was taken yet.
+_STATUS_BY_BYTE = {m.value.encode("ascii"): m for m in STATUS}
+_PMODE_BY_BYTE = {b"0": None, **{m.value.encode("ascii"): m for m in PANORAMA_MODE}}
+
+
+def _lookup(table, key, what):
+    try:
+        return table[key]
+    except KeyError:
+        raise ValueError(f"Unexpected {what} in the mount response: {key!r}") from None
 
 
 class IPANO:
-    """Class for interfacing with the iPANO mount through the serial interface."""
+    """Class for interfacing with the iPANO mount through the serial interface.
+
+    Use it as a context manager, or call `close`, to release the port:
+
+        with IPANO("/dev/ttyUSB0") as mount:
+            alt, az, mode = mount.status()
+    """
 
     # Serial communication
 
@@ -97,63 +146,266 @@ class IPANO:
             parity="N",
             stopbits=1,
             xonxoff=False,
+            timeout=1.0,
+            exclusive=True,
         )
+        self._low_latency()
+        # Drop anything the adapter received before the port was opened so it
+        # does not prefix the first response.
+        self._serial.reset_input_buffer()
+        # On Linux responses are read straight from the file descriptor,
+        # bypassing pyserial's per-read bookkeeping.
+        if sys.platform.startswith("linux"):
+            self._fd = self._serial.fileno()
+        else:
+            self._fd = None
+        self._rxbuf = bytearray()
+
+    def _low_latency(self):
+        # USB-serial bridges buffer incoming bytes for up to 16 ms by default,
+        # which dominates the round-trip time of the short iPANO commands.
+        if sys.platform.startswith("linux"):
+            tty = os.path.basename(os.path.realpath(self._serial.port))
+            try:
+                with open(f"/sys/bus/usb-serial/devices/{tty}/latency_timer", "w") as f:
+                    f.write("1")
+            except OSError:
+                pass
+            try:
+                self._serial.set_low_latency_mode(True)
+            except (AttributeError, OSError, ValueError):
+                pass
+        elif sys.platform == "win32":
+            try:
+                self._serial.set_buffer_size(rx_size=4096, tx_size=4096)
+            except (AttributeError, serial.SerialException):
+                pass
 
     def __str__(self):
         return f"iPANO serial interface: {self._serial.name}"
 
-    def __del__(self):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        # Forget the descriptor so later calls go through pyserial, which
+        # reports the closed port, instead of reusing a recycled fd number.
+        self._fd = None
         self._serial.close()
 
-    def _communicate(self, instruction, data="", output=True):
-        data = "".join(str(d) for d in data)
-        if len(instruction) != 3:
-            raise BadParameter(
-                "Instruction must be a 3 character sequence.", instruction
+    def _read_response(self):
+        if self._fd is None:
+            return self._serial.read_until(b"#")
+
+        buf = self._rxbuf
+        deadline = time.monotonic() + self._serial.timeout
+        while b"#" not in buf:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self._fd], [], [], remaining)[0]:
+                break
+            chunk = os.read(self._fd, 64)
+            if not chunk:
+                raise serial.SerialException(
+                    "device reports readiness to read but returned no data"
+                )
+            buf.extend(chunk)
+
+        return self._pop_response()
+
+    def _pop_response(self):
+        # Bytes past the terminator belong to the next response of a batch.
+        buf = self._rxbuf
+        end = buf.find(b"#") + 1 or len(buf)
+        response = bytes(buf[:end])
+        del buf[:end]
+        return response
+
+    async def _read_response_async(self):
+        # Imported here so that synchronous users do not pay for asyncio.
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        if self._fd is None:
+            return await loop.run_in_executor(None, self._serial.read_until, b"#")
+
+        buf = self._rxbuf
+        if b"#" not in buf:
+            done = loop.create_future()
+
+            def on_readable():
+                if done.done():
+                    return
+                try:
+                    chunk = os.read(self._fd, 64)
+                except BlockingIOError:
+                    return
+                except OSError as e:
+                    done.set_exception(e)
+                    return
+                if not chunk:
+                    done.set_exception(
+                        serial.SerialException(
+                            "device reports readiness to read but returned no data"
+                        )
+                    )
+                    return
+                buf.extend(chunk)
+                if b"#" in buf:
+                    done.set_result(None)
+
+            loop.add_reader(self._fd, on_readable)
+            try:
+                await asyncio.wait_for(done, self._serial.timeout)
+            except asyncio.TimeoutError:
+                pass
+            finally:
+                loop.remove_reader(self._fd)
+
+        return self._pop_response()
+
+    def _check_response(self, instruction, response):
+        if not response.endswith(b"#"):
+            raise CommunicationTimeout(
+                f"No complete response to '{instruction}' from the mount."
             )
-        if len(data) > 33:
-            raise BadParameter("Data must be at most 33 chars.", len(data))
+        return response[6:-1]
 
-        message = f":01{instruction}{data}#"
-        self._serial.write(message.encode())
+    def _receive(self, instruction):
+        return self._check_response(instruction, self._read_response())
+
+    async def _receive_async(self, instruction):
+        return self._check_response(instruction, await self._read_response_async())
+
+    def _communicate(self, instruction, data="", output=True):
+        self._serial.write(_frame(instruction, data))
 
         if output:
-            response = ""
-            while not response.endswith("#"):
-                response += self._serial.read(self._serial.in_waiting).decode()
-            return response[6:-1]
+            return self._receive(instruction)
+
+    async def _communicate_async(self, instruction, data=""):
+        self._serial.write(_frame(instruction, data))
+        return await self._receive_async(instruction)
+
+    def _write_raw(self, frame, output=True):
+        self._serial.write(frame)
+
+        if output:
+            return self._receive(frame[3:6].decode("ascii"))
+
+    def _communicate_batch(self, frames, output=True):
+        # All frames go out in a single write so the mount sees them back to
+        # back, the responses are then collected in order.
+        self._serial.write(b"".join(_frame(instr, data) for instr, data in frames))
+
+        if output:
+            return [self._receive(instr) for instr, _ in frames]
 
     # Firmware and type
 
     def firmware(self):
-        res = self._communicate("FW0")
+        res = self._communicate("FW0").decode("ascii")
         return res[:6], res[6:]
 
     def mount_type(self):
-        return self._communicate("INF")
+        return self._communicate("INF").decode("ascii")
 
     # Motion
 
     def move(self, dir: DIRECTION):
-        self._communicate(f"mv{dir.value}", output=False)
+        self._write_raw(dir._move_frame, output=False)
 
-    def stop(self, axis=None):
-        if axis is None or axis.lower() == "none":
-            self._communicate("mqq")
-        elif axis.lower() == "az":
-            self._communicate("qAZ")
-        elif axis.lower() == "alt":
-            self._communicate("qAL")
-        else:
-            raise BadParameter("Axis must be None, 'alt' or 'az'.", axis)
+    _STOP_CMDS = {None: "mqq", "none": "mqq", "az": "qAZ", "alt": "qAL"}
 
-    def goto(self, alt, az):
-        if alt < -180 or alt > 180:
+    def stop(self, axis=None):
+        key = axis.lower() if isinstance(axis, str) else axis
+        try:
+            instruction = self._STOP_CMDS[key]
+        except (KeyError, TypeError):
+            raise BadParameter("Axis must be None, 'alt' or 'az'.", axis) from None
+        self._communicate(instruction)
+
+    @staticmethod
+    def _goto_data(alt, az):
+        if not -180 <= alt <= 180:
             raise BadParameter("Altitude must be in [-180, 180] range.", alt)
-        if az < 0 or az > 360:
+        if not 0 <= az <= 360:
             raise BadParameter("Azimuth must be in the [0, 360] range.", az)
 
-        self._communicate("SSL", [_fmt(alt, 5, 2, sign=True), _fmt(az, 5, 2)])
+        # The sign follows the value, so that small negatives keep theirs.
+        s = "-" if alt < 0 else "+"
+        return [f"{s}{int(round(abs(alt) * 100)):05d}", f"{int(round(az * 100)):05d}"]
+
+    def goto(self, alt, az):
+        self._communicate("SSL", self._goto_data(alt, az))
+
+    def _goto_frames(self, alts, azs):
+        # Returns the SSL frames and the targets in hundredths of degree.
+        try:
+            import numpy as np
+        except ImportError:
+            data = [self._goto_data(alt, az) for alt, az in zip(alts, azs)]
+            frames = [_frame("SSL", d) for d in data]
+            return frames, [(int(alt), int(az)) for alt, az in data]
+
+        alts = np.asarray(alts, dtype=float)
+        azs = np.asarray(azs, dtype=float)
+        bad = ~np.isfinite(alts) | (alts < -180) | (alts > 180)
+        if bad.any():
+            raise BadParameter("Altitude must be in [-180, 180] range.", alts[bad][0])
+        bad = ~np.isfinite(azs) | (azs < 0) | (azs > 360)
+        if bad.any():
+            raise BadParameter("Azimuth must be in the [0, 360] range.", azs[bad][0])
+
+        alt_i = np.round(alts * 100).astype(np.int64)
+        az_i = np.round(azs * 100).astype(np.int64)
+        alt_s = np.char.add(
+            np.where(alts < 0, "-", "+"), np.char.mod("%05d", np.abs(alt_i))
+        )
+        az_s = np.char.mod("%05d", az_i)
+        frames = np.char.encode(np.char.add(alt_s, az_s), "ascii")
+        head = _PREFIX + b"SSL"
+        targets = list(zip(alt_i.tolist(), az_i.tolist()))
+        return [head + f + _TERMINATOR for f in frames.tolist()], targets
+
+    def goto_many(self, alts, azs, poll=0.1, timeout=120.0):
+        """Visit a sequence of waypoints, one after the other.
+
+        All the command frames are built upfront, vectorized when NumPy is
+        available. After each move, the mount is polled every `poll` seconds
+        until it has moved and stopped again, or reports the target position.
+        Returns the status reached at every waypoint, and raises
+        CommunicationTimeout if one takes longer than `timeout` seconds.
+        """
+        if len(alts) != len(azs):
+            raise BadParameter(
+                "Altitudes and azimuths must have the same length.",
+                (len(alts), len(azs)),
+            )
+
+        reached = []
+        frames, targets = self._goto_frames(alts, azs)
+        for i, (frame, target) in enumerate(zip(frames, targets)):
+            self._write_raw(frame)
+            deadline = time.monotonic() + timeout
+            moved = False
+            while True:
+                alt, az, mode = self.status()
+                if mode is STATUS.MOVING:
+                    moved = True
+                else:
+                    position = (round(alt * 100), round(az * 100) % 36000)
+                    if moved or position == (target[0], target[1] % 36000):
+                        break
+                if time.monotonic() > deadline:
+                    raise CommunicationTimeout(
+                        f"The mount did not reach waypoint {i} in time."
+                    )
+                time.sleep(poll)
+            reached.append((alt, az, mode))
+        return reached
 
     # Set and Operation
 
@@ -166,13 +418,14 @@ class IPANO:
     def set_zero_position(self):
         self._communicate("SPZ", "1")
 
+    _REF_CMDS = {0: "0", 2: "1"}
+
     def set_reference_point(self, id):
-        if id == 0:
-            self._communicate("SOP", "0")
-        elif id == 2:
-            self._communicate("SOP", "1")
-        else:
-            raise BadParameter("ID can only be 0 or 2.", id)
+        try:
+            data = self._REF_CMDS[id]
+        except (KeyError, TypeError):
+            raise BadParameter("ID can only be 0 or 2.", id) from None
+        self._communicate("SOP", data)
 
     def preview_panorama(self, pos: POSITION):
         self._communicate("SPA", ["0", pos.value])
@@ -180,44 +433,69 @@ class IPANO:
     def start_panorama(self, mode: PANORAMA_MODE, id: IMAGING_PATH):
         self._communicate("SPA", [mode.value, id.value])
 
+    def _timelapse_frames(self, N, ang):
+        return [
+            ("STL", ["0", f"{int(N):05d}"]),
+            ("STL", ["1", f"{'-' if ang < 0 else '+'}{int(round(abs(ang) * 10)):03d}"]),
+        ]
+
     def set_timelapse(self, N, ang=0.0):
-        self._communicate("STL", ["0", _fmt(N, 5)])
-        self._communicate("STL", ["1", _fmt(ang, 3, 1, sign=True)])
+        self._communicate_batch(self._timelapse_frames(N, ang))
 
     def get_step(self):
         res = self._communicate("GTL")
-        return float(res[:6]), float(res[6:])
+        return int(res[:6]) / 100, int(res[6:]) / 100
 
     def set_timing(self, mode: TIMING_PARAMETER, seconds):
-        self._communicate("STT", [mode.value, _fmt(seconds, 7)])
+        self._communicate("STT", [mode.value, f"{int(seconds):07d}"])
 
     def get_timing(self, mode: TIMING_PARAMETER):
-        res = self._communicate("GTT", mode.value)
+        res = self._write_raw(mode._get_frame)
         return int(res)
 
+    def configure(
+        self, mode: PANORAMA_MODE, id: IMAGING_PATH, N=None, ang=0.0, timing=None
+    ):
+        """Set the time-lapse and timing parameters, then start the panorama.
+
+        All settings are sent in a single write. `timing` maps
+        TIMING_PARAMETER members to durations in seconds.
+        """
+        frames = []
+        if N is not None:
+            frames += self._timelapse_frames(N, ang)
+        if timing is not None:
+            for param, seconds in timing.items():
+                frames.append(("STT", [param.value, f"{int(seconds):07d}"]))
+        frames.append(("SPA", [mode.value, id.value]))
+        self._communicate_batch(frames)
+
     def shooting_control(self, cmd: SHOOTING_CONTROL):
-        self._communicate("SPC", cmd.value)
+        self._write_raw(cmd._control_frame)
 
-    def status(self):
-        res = self._communicate("GAS")
-        alt = float(res[:6]) / 100
-        az = float(res[6:-1]) / 100
-        mode = STATUS(res[-1])
+    @staticmethod
+    def _parse_status(res):
+        alt = int(res[:6]) / 100
+        az = int(res[6:-1]) / 100
+        mode = _lookup(_STATUS_BY_BYTE, res[-1:], "status")
         return alt, az, mode
 
+    def status(self):
+        return self._parse_status(self._communicate("GAS"))
+
     def set_fov(self, fov):
-        self._communicate("SFV", _fmt(fov, 4, 1))
+        self._communicate("SFV", [f"{int(round(fov * 10)):04d}"])
 
     def get_fov(self):
         res = self._communicate("GFV")
-        return float(res) / 10
+        return int(res) / 10
 
     def repeat_last(self):
         self._communicate("SRE")
 
     def check_last(self):
         res = self._communicate("GRE")
-        return PANORAMA_MODE(res)
+        return _lookup(_PMODE_BY_BYTE, res, "panorama mode")
 
     def get_progress(self):
         res = self._communicate("GPG")
@@ -226,3 +504,15 @@ class IPANO:
     def battery(self):
         res = self._communicate("GPW")
         return int(res)
+
+    # Asynchronous access
+    #
+    # These coroutines wait for the response without blocking the event loop,
+    # so several mounts can be driven concurrently with asyncio.gather. Calls
+    # on the same mount must still be awaited one after the other.
+
+    async def goto_async(self, alt, az):
+        await self._communicate_async("SSL", self._goto_data(alt, az))
+
+    async def status_async(self):
+        return self._parse_status(await self._communicate_async("GAS"))
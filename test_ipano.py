@@ -0,0 +1,216 @@
+import asyncio
+import os
+import pty
+import sys
+
+import pytest
+
+serial = pytest.importorskip("serial")
+if not hasattr(os, "openpty"):
+    pytest.skip("needs a pseudo-terminal", allow_module_level=True)
+
+import ipano  # noqa: E402
+
+
+@pytest.fixture
+def mount():
+    # The mount side of the link is the pty master, its responses are queued
+    # before each call since they are read back in order.
+    master, slave = pty.openpty()
+    with ipano.IPANO(os.ttyname(slave)) as dev:
+        yield dev, master
+    os.close(master)
+    os.close(slave)
+
+
+def test_goto_many_waits_for_the_move(mount):
+    dev, master = mount
+    os.write(
+        master,
+        b":01SSL#"
+        b":01GAS+00000000000#"  # not started yet
+        b":01GAS+00500001001#"
+        b":01GAS+01000020000#"
+        b":01SSL#"
+        b":01GAS-00550360000#",  # already there
+    )
+
+    reached = dev.goto_many([10, -5.5], [20, 0], poll=0)
+
+    assert reached == [
+        (10.0, 20.0, ipano.STATUS.STOPPED),
+        (-5.5, 360.0, ipano.STATUS.STOPPED),
+    ]
+    assert os.read(master, 1024) == (
+        b":01SSL+0100002000#:01GAS#:01GAS#:01GAS#:01SSL-0055000000#:01GAS#"
+    )
+
+
+def test_goto_many_length_mismatch(mount):
+    dev, master = mount
+    with pytest.raises(ipano.BadParameter):
+        dev.goto_many([10, 20], [30])
+
+
+def test_goto_frames_numpy_matches_scalar(mount, monkeypatch):
+    np = pytest.importorskip("numpy")
+    dev, master = mount
+    alts = np.array([12.345, -20.0, 0.005, -0.001])
+    azs = np.array([0.0, 359.999, 180.0, 90.0])
+
+    vectorized = dev._goto_frames(alts, azs)
+    for bad_alts, bad_azs in [([200.0], [0.0]), ([np.nan], [0.0]), ([0.0], [np.inf])]:
+        with pytest.raises(ipano.BadParameter):
+            dev._goto_frames(np.array(bad_alts), np.array(bad_azs))
+
+    monkeypatch.setitem(sys.modules, "numpy", None)
+    scalar = dev._goto_frames(alts.tolist(), azs.tolist())
+
+    assert vectorized == scalar
+    with pytest.raises(ipano.BadParameter):
+        dev._goto_frames([float("nan")], [0.0])
+
+
+def test_get_step_in_degrees(mount):
+    dev, master = mount
+    os.write(master, b":01GTL+01250-36000#")
+
+    assert dev.get_step() == (12.5, -360.0)
+
+
+def test_status_async(mount):
+    dev, master = mount
+    os.write(master, b":01GAS+01234123451#")
+
+    status = asyncio.run(dev.status_async())
+
+    assert status == (12.34, 123.45, ipano.STATUS.MOVING)
+
+
+@pytest.mark.parametrize(
+    "response, expected",
+    [(b"0", None), (b"1", ipano.PANORAMA_MODE.MATRIX)],
+)
+def test_check_last(mount, response, expected):
+    dev, master = mount
+    os.write(master, b":01GRE" + response + b"#")
+
+    assert dev.check_last() is expected
+
+
+@pytest.mark.parametrize("response", [b"", b"9"])
+def test_check_last_unexpected(mount, response):
+    dev, master = mount
+    os.write(master, b":01GRE" + response + b"#")
+
+    with pytest.raises(ValueError, match="panorama mode"):
+        dev.check_last()
+
+
+def test_status_unexpected_mode(mount):
+    dev, master = mount
+    os.write(master, b":01GAS+01234123459#")
+
+    with pytest.raises(ValueError, match="status"):
+        dev.status()
+
+
+@pytest.mark.parametrize(
+    "axis, frame",
+    [(None, b":01mqq#"), ("none", b":01mqq#"), ("AZ", b":01qAZ#"), ("alt", b":01qAL#")],
+)
+def test_stop(mount, axis, frame):
+    dev, master = mount
+    os.write(master, b":01" + frame[3:6] + b"#")
+
+    dev.stop(axis)
+
+    assert os.read(master, 1024) == frame
+
+
+@pytest.mark.parametrize("axis", ["x", ["az"]])
+def test_stop_bad_axis(mount, axis):
+    dev, master = mount
+    with pytest.raises(ipano.BadParameter):
+        dev.stop(axis)
+
+
+@pytest.mark.parametrize("id, frame", [(0, b":01SOP0#"), (2, b":01SOP1#")])
+def test_set_reference_point(mount, id, frame):
+    dev, master = mount
+    os.write(master, b":01SOP#")
+
+    dev.set_reference_point(id)
+
+    assert os.read(master, 1024) == frame
+
+
+@pytest.mark.parametrize("id", [1, [0]])
+def test_set_reference_point_bad_id(mount, id):
+    dev, master = mount
+    with pytest.raises(ipano.BadParameter):
+        dev.set_reference_point(id)
+
+
+@pytest.mark.parametrize(
+    "call, frame",
+    [
+        (lambda dev: dev.goto(12.3456, 0.004), b":01SSL+0123500000#"),
+        (lambda dev: dev.goto(-0.001, 359.996), b":01SSL-0000036000#"),
+        (lambda dev: dev.goto(-180, 360), b":01SSL-1800036000#"),
+        (lambda dev: dev.set_fov(45.06), b":01SFV0451#"),
+        (
+            lambda dev: dev.set_timing(ipano.TIMING_PARAMETER.TIME_INTERVAL, 90.9),
+            b":01STT10000090#",
+        ),
+    ],
+)
+def test_payload_formatting(mount, call, frame):
+    dev, master = mount
+    os.write(master, b":01" + frame[3:6] + b"#")
+
+    call(dev)
+
+    assert os.read(master, 1024) == frame
+
+
+@pytest.mark.parametrize(
+    "N, ang, frames",
+    [
+        (12, 2.54, b":01STL000012#:01STL1+025#"),
+        (3, -12.36, b":01STL000003#:01STL1-124#"),
+        (1, -0.01, b":01STL000001#:01STL1-000#"),
+    ],
+)
+def test_set_timelapse_formatting(mount, N, ang, frames):
+    dev, master = mount
+    os.write(master, b":01STL#:01STL#")
+
+    dev.set_timelapse(N, ang)
+
+    assert os.read(master, 1024) == frames
+
+
+def test_configure_batch(mount, monkeypatch):
+    dev, master = mount
+    writes = []
+    write = dev._serial.write
+    monkeypatch.setattr(
+        dev._serial, "write", lambda data: writes.append(data) or write(data)
+    )
+    # All the responses arrive at once, the battery one included.
+    os.write(master, b":10STL1#:10STL1#:10STT1#:10SPA1#:10GPW085#")
+
+    dev.configure(
+        ipano.PANORAMA_MODE.TIME_LAPSE,
+        ipano.IMAGING_PATH.HORIZONTAL_ALTERNATING_DOWN,
+        N=10,
+        ang=-1.5,
+        timing={ipano.TIMING_PARAMETER.TIME_INTERVAL: 30},
+    )
+
+    assert writes == [
+        b":01STL000010#:01STL1-015#:01STT10000030#:01SPA30#",
+    ]
+    assert dev.battery() == 85
+    assert os.read(master, 1024) == writes[0] + b":01GPW#"